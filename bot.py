@@ -1,24 +1,45 @@
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
 import telebot
 from telebot import types
-from pathlib import Path
 
 from config import TOKEN, DATABASE
-from logic import DB_Map
+from logic import DB_Map, render_city_png, render_png
+
+# Сессия requests живёт час: TLS-соединение с api.telegram.org переиспользуется между
+# запросами, а обработчики работают в пуле потоков и не ждут отправки чужих фото.
+telebot.apihelper.SESSION_TIME_TO_LIVE = 3600
+bot = telebot.TeleBot(TOKEN, threaded=True, num_threads=8)
+# manager (DB_Map) и _RENDER_POOL создаются в __main__ (см. конец файла): процессы пула
+# запускаются через spawn и импортируют этот модуль заново — каталог городов им не нужен.
 
-bot = telebot.TeleBot(TOKEN)
-manager = DB_Map(DATABASE)
-manager.create_user_table()
+_COMMAND_ARGS_RE = re.compile(r"\s*\S+\s+(.+)", re.DOTALL)
 
 
 def _city_from_text(text: str) -> str:
     """Возвращает всё после имени команды как название города."""
     # Пример: "/show_city New York" -> "New York"
-    if not text:
-        return ""
-    parts = text.split(maxsplit=1)
-    if len(parts) == 1:
-        return ""
-    return parts[1].strip()
+    # Заранее скомпилированное выражение не строит список, как split, и, в отличие от
+    # partition(" "), отделяет команду любым пробельным символом ("/show_city\tLondon")
+    match = _COMMAND_ARGS_RE.match(text)
+    return match.group(1).strip() if match else ""
+
+
+def _send_map(chat_id: int, cities) -> None:
+    """
+    Рисует карту в пуле процессов и отправляет её из потока обработчика. Ждать здесь
+    можно: обработчиков несколько, а done-callback пула выполнялся бы в одном его
+    служебном потоке и выстроил бы отправку фото всех пользователей в очередь.
+    """
+    try:
+        png = _RENDER_POOL.submit(render_png, cities).result()
+        bot.send_photo(chat_id, png)
+    except Exception:
+        telebot.logger.exception("Не удалось нарисовать или отправить карту для чата %s", chat_id)
+        bot.send_message(chat_id, "Не получилось нарисовать карту, попробуй ещё раз.")
 
 
 @bot.message_handler(commands=["start"])
@@ -35,7 +56,7 @@ def handle_help(message):
     help_text = (
         "Доступные команды:\n"
         "/show_city <город на английском> — показать город на карте\n"
-        "/remember_city <город на английском> — сохранить город\n"
+        "/remember_city <город на английском> — сохранить город (можно несколько через запятую)\n"
         "/show_my_cities — показать все сохранённые города\n"
     )
     bot.send_message(message.chat.id, help_text)
@@ -54,22 +75,27 @@ def handle_show_city(message):
         return
 
     lat, lon, name = coords  # lon здесь — это фактически lng из БД
-    path = Path(f"map_{message.chat.id}_single.png")
-    img_path = manager.create_graph(
-        str(path),
-        [{"city": name, "lat": lat, "lon": lon}],  # можно и 'lng' передать — логика поддерживает оба ключа
-    )
-    with open(img_path, "rb") as img:
-        bot.send_photo(message.chat.id, img)
+    # Один город — просто точка на готовой подложке, это быстрее, чем гонять пул процессов
+    bot.send_photo(message.chat.id, render_city_png(name, lat, lon))
 
 
 @bot.message_handler(commands=["remember_city"])
 def handle_remember_city(message):
-    city_name = _city_from_text(message.text or "")
-    if not city_name:
-        bot.send_message(message.chat.id, "Формат: /remember_city <city_name>")
+    # Несколько городов через запятую сохраняем одной транзакцией
+    names = [n.strip() for n in _city_from_text(message.text or "").split(",") if n.strip()]
+    if not names:
+        bot.send_message(message.chat.id, "Формат: /remember_city <city_name>[, <city_name>...]")
         return
 
+    if len(names) > 1:
+        saved, unknown = manager.add_cities(message.from_user.id, names)
+        text = f"Сохранено городов: {saved}."
+        if unknown:
+            text += " Не нашёл: " + ", ".join(unknown) + ". Убедись, что они написаны на английском!"
+        bot.send_message(message.chat.id, text)
+        return
+
+    city_name = names[0]
     if manager.add_city(message.from_user.id, city_name):
         bot.send_message(message.chat.id, f"Город {city_name} успешно сохранён!")
     else:
@@ -79,15 +105,23 @@ def handle_remember_city(message):
 @bot.message_handler(commands=["show_my_cities"])
 def handle_show_my_cities(message):
     cities = manager.select_cities(message.from_user.id)
-    if not cities:
+    if not cities["names"]:
         bot.send_message(message.chat.id, "Пока нет сохранённых городов. Добавь через /remember_city <city_name>.")
         return
 
-    path = Path(f"map_{message.chat.id}_all.png")
-    img_path = manager.create_graph(str(path), cities)
-    with open(img_path, "rb") as img:
-        bot.send_photo(message.chat.id, img)
+    _send_map(message.chat.id, cities)
 
 
 if __name__ == "__main__":
-    bot.polling()
+    manager = DB_Map(DATABASE)
+    manager.create_user_table()
+
+    # Matplotlib не потокобезопасен и упирается в GIL, поэтому карты рисуем в отдельных
+    # процессах — одновременные запросы разных пользователей не ждут друг друга.
+    # spawn, а не fork: форк многопоточного процесса может унаследовать чужую
+    # захваченную блокировку и зависнуть навсегда.
+    _RENDER_POOL = ProcessPoolExecutor(
+        max_workers=os.cpu_count(), mp_context=multiprocessing.get_context("spawn")
+    )
+
+    bot.infinity_polling(skip_pending=True, timeout=30, long_polling_timeout=25)
@@ -1,11 +1,30 @@
+import contextlib
+import functools
+import io
+import queue
 import sqlite3
-from typing import Iterable, List, Optional, Tuple, Dict, Any
+import string
+import threading
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Tuple, Dict, Any, Union
 from config import DATABASE
 
+import numpy as np
+from PIL import Image, ImageDraw
+
+try:
+    from numba import njit
+except ImportError:  # numba необязателен: без него ядра работают как обычные функции
+    def njit(*args, **kwargs):
+        def wrap(fn):
+            return fn
+        return wrap
+
 # Рендерим карту в headless-окружении
 import matplotlib
 matplotlib.use("Agg")
-import matplotlib.pyplot as plt
+from matplotlib.axes import Axes
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 
 # Cartopy для карты и проекций
 import cartopy.crs as ccrs
@@ -14,57 +33,322 @@ import cartopy.feature as cfeature
 
 # id, city, lat, lng, country, population (последние поля зависят от структуры вашей БД)
 CityRow = Tuple[int, str, float, float, str, int]
+# Города "по столбцам": {"names": list[str], "lats": ndarray, "lons": ndarray, "countries": list[str]}
+CityColumns = Dict[str, Any]
+
+# SQL держим константами: одинаковый текст запроса попадает в кэш подготовленных
+# выражений sqlite3 и не компилируется заново.
+_SQL_CREATE_USERS_CITIES = """
+    CREATE TABLE IF NOT EXISTS users_cities (
+        user_id INTEGER NOT NULL,
+        city_id INTEGER NOT NULL,
+        PRIMARY KEY (user_id, city_id)
+    )
+"""
+_SQL_CATALOG = "SELECT id, city, lat, lng, country, population FROM cities ORDER BY id"
+# NOT EXISTS — потому что в старых базах у users_cities нет первичного ключа,
+# и одного INSERT OR IGNORE мало, чтобы не плодить повторные строки.
+_SQL_INSERT_USER_CITY = """
+    INSERT OR IGNORE INTO users_cities (user_id, city_id)
+    SELECT ?, ? WHERE NOT EXISTS (SELECT 1 FROM users_cities WHERE user_id = ? AND city_id = ?)
+"""
+_SQL_USER_CITIES = """
+    SELECT c.city, c.lat, c.lng, c.country
+    FROM users_cities uc
+    JOIN cities c ON c.id = uc.city_id
+    WHERE uc.user_id = ?
+    ORDER BY c.city
+"""
+
+# NOCASE в SQLite сворачивает регистр только у ASCII — ключ каталога нормализуем так же,
+# иначе str.lower() склеил бы имена, которые база считает разными.
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def _city_key(city_name: str) -> str:
+    return city_name.strip().translate(_ASCII_LOWER)
+
+
+MAP_FIGSIZE = (10, 5)
+# Telegram всё равно пережимает превью, а 150 dpi — почти вдвое меньше пикселей, чем 200
+MAP_DPI = 150
+# Сетка прореживания подписей (в градусах): в каждой ячейке подписываем один город
+LABEL_CELL_DEG = 2.0
+
+# Проекция создаётся один раз: объект Cartopy держит свой PROJ-контекст
+_PC = ccrs.PlateCarree()
+# Границы карты мира в PlateCarree: (lon_min, lon_max, lat_min, lat_max)
+WORLD_EXTENT = (-180, 180, -90, 90)
+
+# Подложка (суша, океан, берега, границы) не зависит от запроса, а её отрисовка Cartopy —
+# самая дорогая часть. Рендерим её один раз на (figsize, dpi) и дальше рисуем только точки.
+_BASEMAP_CACHE: Dict[Tuple[Tuple[float, float], int], np.ndarray] = {}
+_BASEMAP_LOCK = threading.Lock()
+
+
+# Для карты мира 10x5 дюймов детализация 50m/10m не видна, а вершин в ней на порядок
+# больше — явно берём самый грубый масштаб Natural Earth.
+_NE_SCALE = "110m"
+_LAND = cfeature.NaturalEarthFeature(
+    "physical", "land", _NE_SCALE, edgecolor="face", facecolor=cfeature.COLORS["land"]
+)
+_OCEAN = cfeature.NaturalEarthFeature(
+    "physical", "ocean", _NE_SCALE, edgecolor="face", facecolor=cfeature.COLORS["water"]
+)
+_COASTLINE = cfeature.NaturalEarthFeature(
+    "physical", "coastline", _NE_SCALE, edgecolor="black", facecolor="never"
+)
+_BORDERS = cfeature.NaturalEarthFeature(
+    "cultural", "admin_0_boundary_lines_land", _NE_SCALE, edgecolor="black", facecolor="never"
+)
+
+# Слои подложки: (признак Natural Earth, стиль поверх его стиля по умолчанию)
+_BASE_LAYERS = (
+    (_LAND, {"zorder": 0, "edgecolor": "black", "linewidth": 0.2}),
+    (_OCEAN, {"zorder": 0}),
+    (_COASTLINE, {"linewidth": 0.4}),
+    (_BORDERS, {"linestyle": ":", "linewidth": 0.4}),
+)
+
+
+def _basemap_rgba(figsize: Tuple[float, float] = MAP_FIGSIZE, dpi: int = MAP_DPI) -> np.ndarray:
+    """Возвращает RGBA-растр подложки карты мира, при первом вызове отрисовывая его Cartopy."""
+    key = (tuple(figsize), int(dpi))
+    rgba = _BASEMAP_CACHE.get(key)
+    if rgba is not None:
+        return rgba
+    with _BASEMAP_LOCK:
+        rgba = _BASEMAP_CACHE.get(key)
+        if rgba is None:
+            fig = Figure(figsize=figsize, dpi=dpi, facecolor="white")
+            FigureCanvasAgg(fig)
+            ax = fig.add_axes((0, 0, 1, 1), projection=_PC)
+            ax.set_global()
+
+            # Базовые слои
+            for feature, style in _BASE_LAYERS:
+                ax.add_feature(feature, **style)
+
+            fig.canvas.draw()
+            # copy(): буфер принадлежит канвасу и живёт, только пока жива фигура
+            rgba = np.asarray(fig.canvas.buffer_rgba()).copy()
+            _BASEMAP_CACHE[key] = rgba
+    return rgba
+
+
+def _new_map_figure(figsize: Tuple[float, float] = MAP_FIGSIZE, dpi: int = MAP_DPI) -> Tuple[Figure, Axes]:
+    """
+    Создаёт фигуру с готовой подложкой. Оси — обычные (не GeoAxes) в координатах
+    lon/lat, так что точки рисуются без трансформаций Cartopy.
+    """
+    fig = Figure(figsize=figsize, dpi=dpi, facecolor="white")
+    FigureCanvasAgg(fig)
+    ax = fig.add_axes((0, 0, 1, 1))
+    ax.imshow(_basemap_rgba(figsize, dpi), extent=WORLD_EXTENT, aspect="auto", interpolation="nearest")
+    ax.set_xlim(WORLD_EXTENT[0], WORLD_EXTENT[1])
+    ax.set_ylim(WORLD_EXTENT[2], WORLD_EXTENT[3])
+    ax.set_axis_off()
+    return fig, ax
+
+
+# Готовые фигуры с подложкой переиспользуем: после рисования снимаем с них точки и
+# подписи и кладём обратно, вместо того чтобы каждый раз собирать Figure заново.
+_FIG_POOL_SIZE = 4
+_FIG_POOL: "queue.Queue[Tuple[Figure, Axes]]" = queue.Queue(maxsize=_FIG_POOL_SIZE)
+
+
+@contextlib.contextmanager
+def _pooled_map_figure() -> Iterator[Tuple[Figure, Axes]]:
+    """Выдаёт фигуру с подложкой из пула (или новую, если пул пуст) и после использования очищает её."""
+    try:
+        fig, ax = _FIG_POOL.get_nowait()
+    except queue.Empty:
+        fig, ax = _new_map_figure()
+    try:
+        yield fig, ax
+    finally:
+        # На фигуре из пула остаётся только картинка подложки
+        for artist in [*ax.collections, *ax.lines, *ax.texts]:
+            artist.remove()
+        ax.set_prop_cycle(None)  # чтобы цвета не сдвигались от запроса к запросу
+        try:
+            _FIG_POOL.put_nowait((fig, ax))
+        except queue.Full:
+            pass
+
+
+def _city_columns(
+    cities: Union[CityColumns, Iterable[Dict[str, Any]]]
+) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """Приводит города к (names, lats, lons): принимает CityColumns или список dict (city, lat, lon|lng)."""
+    if isinstance(cities, dict):
+        return (
+            list(cities["names"]),
+            np.asarray(cities["lats"], dtype=np.float64),
+            np.asarray(cities["lons"], dtype=np.float64),
+        )
+    cities = list(cities)
+    names = [str(it.get("city") or it.get("name") or "") for it in cities]
+    lats = np.fromiter((float(it["lat"]) for it in cities), dtype=np.float64, count=len(cities))
+    # поддерживаем ключ и 'lon', и 'lng'
+    lons = np.fromiter(
+        (float(it.get("lon", it.get("lng"))) for it in cities), dtype=np.float64, count=len(cities)
+    )
+    return names, lats, lons
+
+
+@njit(cache=True)
+def _prep_points(lats, lons):
+    """
+    Готовит координаты к отрисовке: переносит долготу в [-180, 180), обрезает широту
+    до [-90, 90] и считает позиции подписей (на 1° правее и выше точки, не выше края карты).
+    Возвращает (lons, lats, label_lons, label_lats).
+    """
+    n = lats.shape[0]
+    out_lons = np.empty(n, dtype=np.float64)
+    out_lats = np.empty(n, dtype=np.float64)
+    label_lons = np.empty(n, dtype=np.float64)
+    label_lats = np.empty(n, dtype=np.float64)
+    for i in range(n):
+        # % с положительным делителем даёт [0, 360) и для отрицательных долгот
+        lon = (lons[i] + 180.0) % 360.0 - 180.0
+        lat = min(max(lats[i], -90.0), 90.0)
+        out_lons[i] = lon
+        out_lats[i] = lat
+        label_lons[i] = lon + 1.0
+        label_lats[i] = min(lat + 1.0, 88.0)
+    return out_lons, out_lats, label_lons, label_lats
+
+
+def _label_indices(lons: np.ndarray, lats: np.ndarray, cell: float = LABEL_CELL_DEG) -> np.ndarray:
+    """
+    Возвращает индексы городов, которые стоит подписать: по одному на ячейку сетки
+    cell x cell градусов (первый по порядку). Остальные точки рисуются без подписи —
+    при сотнях городов подписи всё равно слипаются, а каждый текст — отдельный артист.
+    """
+    n_rows = int(np.ceil(180.0 / cell)) + 1
+    bx = np.floor((lons + 180.0) / cell).astype(np.int32)
+    by = np.floor((lats + 90.0) / cell).astype(np.int32)
+    _, first = np.unique(bx * n_rows + by, return_index=True)
+    return np.sort(first)
+
+
+def _save_png(fig: Figure, out: Union[str, BinaryIO]) -> None:
+    """
+    Сохраняет фигуру в PNG одним проходом Agg. Оси уже занимают всю фигуру, поэтому
+    bbox_inches="tight" (лишний рендер ради замера рамки) и tight_layout не нужны;
+    compress_level=1 — быстрое сжатие ценой чуть большего файла.
+    """
+    fig.savefig(out, format="png", dpi=MAP_DPI, pil_kwargs={"compress_level": 1})
+
+
+def render_map(
+    out: Union[str, BinaryIO], cities: Union[CityColumns, Iterable[Dict[str, Any]]]
+) -> Union[str, BinaryIO]:
+    """
+    Рисует карту с городами и сохраняет PNG в `out`. Не трогает базу, поэтому
+    годится для запуска в отдельном процессе (см. render_png).
+    """
+    names, lats, lons = _city_columns(cities)
+    lons, lats, label_lons, label_lats = _prep_points(lats, lons)
+
+    # Берём карту с закэшированной подложкой из пула
+    with _pooled_map_figure() as (fig, ax):
+        # Точки городов: одна коллекция на все точки вместо Line2D на каждую
+        ax.scatter(lons, lats, s=16, marker="o")
+        for i in _label_indices(lons, lats):
+            if names[i]:
+                ax.annotate(names[i], (label_lons[i], label_lats[i]), fontsize=7)
+
+        _save_png(fig, out)
+    return out
+
+
+def render_png(cities: Union[CityColumns, Iterable[Dict[str, Any]]]) -> bytes:
+    """Рисует карту с городами и возвращает PNG байтами — удобно передавать между процессами."""
+    buf = io.BytesIO()
+    render_map(buf, cities)
+    return buf.getvalue()
+
+
+@functools.lru_cache(maxsize=1)
+def _basemap_image() -> Image.Image:
+    """Подложка по умолчанию как RGB-картинка PIL (для отметки одного города без Matplotlib)."""
+    return Image.fromarray(_basemap_rgba()).convert("RGB")
+
+
+def render_city_png(name: str, lat: float, lon: float) -> bytes:
+    """
+    Рисует один город поверх готовой подложки средствами PIL и возвращает PNG байтами.
+    Ни Matplotlib, ни Cartopy на этом пути не участвуют — только копия растра и кружок.
+    """
+    img = _basemap_image().copy()
+    lon_min, lon_max, lat_min, lat_max = WORLD_EXTENT
+    # PlateCarree на весь мир — линейное отображение lon/lat в пиксели
+    # lon=180 / lat=-90 попадают ровно на край — прижимаем к последнему пикселю
+    px = min(int((lon - lon_min) / (lon_max - lon_min) * img.width), img.width - 1)
+    py = min(int((lat_max - lat) / (lat_max - lat_min) * img.height), img.height - 1)
+    draw = ImageDraw.Draw(img)
+    draw.ellipse((px - 4, py - 4, px + 4, py + 4), fill="#1f77b4")
+    draw.text((px + 6, py - 12), name, fill="black")
+
+    buf = io.BytesIO()
+    img.save(buf, format="PNG", compress_level=1)
+    return buf.getvalue()
 
 
 class DB_Map:
     def __init__(self, database: str):
         self.database = database
+        # Одно соединение на процесс: открывать базу на каждый запрос дороже самого SELECT.
+        # isolation_level=None — автокоммит, запись защищаем своей блокировкой.
+        self._conn = self._connect()
+        self._write_lock = threading.Lock()
+        # Каталог cities статичен: читаем его целиком один раз и ищем города в словаре.
+        # Если каталог пересобирают — вызвать self.load_catalog().
+        self._catalog: Dict[str, CityRow] = {}
+        self.load_catalog()
 
     # ---------- DB utils ----------
-    def _connect(self):
-        return sqlite3.connect(self.database)
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.database, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def _execute_write(self, sql: str, params: Tuple[Any, ...] = tuple()) -> sqlite3.Cursor:
+        with self._write_lock:
+            return self._conn.execute(sql, params)
 
     def create_user_table(self) -> None:
         """Создаёт таблицу users_cities, если её ещё нет."""
-        with self._connect() as conn:
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS users_cities (
-                    user_id INTEGER NOT NULL,
-                    city_id INTEGER NOT NULL,
-                    PRIMARY KEY (user_id, city_id)
-                )
-                """
-            )
-            conn.commit()
+        self._execute_write(_SQL_CREATE_USERS_CITIES)
 
     # ---------- Queries over cities catalog ----------
     def _fetchone(self, sql: str, params: Tuple[Any, ...]) -> Optional[tuple]:
-        with self._connect() as conn:
-            cur = conn.execute(sql, params)
-            return cur.fetchone()
+        return self._conn.execute(sql, params).fetchone()
 
     def _fetchall(self, sql: str, params: Tuple[Any, ...] = tuple()) -> list:
-        with self._connect() as conn:
-            cur = conn.execute(sql, params)
-            return cur.fetchall()
+        return self._conn.execute(sql, params).fetchall()
+
+    def load_catalog(self) -> None:
+        """Загружает справочник cities в память (несколько МБ на десятки тысяч городов)."""
+        catalog: Dict[str, CityRow] = {}
+        for row in self._fetchall(_SQL_CATALOG):
+            # при одинаковых названиях оставляем город с меньшим id
+            catalog.setdefault(_city_key(row[1]), row)
+        self._catalog = catalog
 
     def get_city_by_name(self, city_name: str) -> Optional[CityRow]:
         """Возвращает строку из справочника cities по имени (без учёта регистра)."""
-        row = self._fetchone(
-            "SELECT id, city, lat, lng, country, population FROM cities WHERE LOWER(city)=LOWER(?)",
-            (city_name.strip(),),
-        )
-        return row  # type: ignore[return-value]
+        return self._catalog.get(_city_key(city_name))
 
     def get_coords_by_name(self, city_name: str) -> Optional[Tuple[float, float, str]]:
         """Возвращает (lat, lng, printable_city_name) или None, если город не найден."""
-        row = self._fetchone(
-            "SELECT lat, lng, city FROM cities WHERE LOWER(city)=LOWER(?)",
-            (city_name.strip(),),
-        )
+        row = self.get_city_by_name(city_name)
         if row:
-            lat, lng, name = row
+            _, name, lat, lng = row[:4]
             return float(lat), float(lng), str(name)
         return None
 
@@ -74,78 +358,75 @@ class DB_Map:
         Добавляет город пользователю. Возвращает True, если город существует в каталоге
         (вставка идемпотентна). False — если город не найден.
         """
+        # id берём из каталога в памяти, так что в базу уходит только сама вставка
         city = self.get_city_by_name(city_name)
         if not city:
             return False
-        city_id = int(city[0])
-        with self._connect() as conn:
-            conn.execute(
-                "INSERT OR IGNORE INTO users_cities (user_id, city_id) VALUES (?, ?)",
-                (int(user_id), city_id),
-            )
-            conn.commit()
+        uid, city_id = int(user_id), int(city[0])
+        self._execute_write(_SQL_INSERT_USER_CITY, (uid, city_id, uid, city_id))
         return True
 
-    def select_cities(self, user_id: int) -> List[Dict[str, Any]]:
-        """Возвращает список городов пользователя с координатами."""
-        rows = self._fetchall(
-            """
-            SELECT c.city, c.lat, c.lng, c.country
-            FROM users_cities uc
-            JOIN cities c ON c.id = uc.city_id
-            WHERE uc.user_id = ?
-            ORDER BY c.city
-            """,
-            (int(user_id),),
-        )
-        # Возвращаю и 'lon' и 'lng' (одно и то же значение), чтобы код, который ожидает lon, тоже работал
-        return [
-            {"city": r[0], "lat": float(r[1]), "lon": float(r[2]), "lng": float(r[2]), "country": r[3]}
-            for r in rows
-        ]
+    def add_cities(self, user_id: int, city_names: Iterable[str]) -> Tuple[int, List[str]]:
+        """
+        Добавляет пользователю несколько городов одной транзакцией на все вставки.
+        Возвращает (число разных найденных городов, названия, которых нет в каталоге).
+        """
+        names = [n.strip() for n in city_names if n.strip()]
+        if not names:
+            return 0, []
+        found = [(n, self.get_city_by_name(n)) for n in names]
+
+        # Повторы в списке ("Paris, paris") убираем заранее: вставок меньше, и счётчик
+        # сохранённых городов считает каждый город один раз.
+        city_ids = list(dict.fromkeys(int(city[0]) for _, city in found if city))
+        uid = int(user_id)
+        pairs = [(uid, city_id, uid, city_id) for city_id in city_ids]
+        with self._write_lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(_SQL_INSERT_USER_CITY, pairs)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return len(city_ids), [n for n, city in found if not city]
+
+    def select_cities(self, user_id: int) -> CityColumns:
+        """
+        Возвращает города пользователя по столбцам: names, lats, lons (float64-массивы), countries.
+        Такой формат create_graph рисует напрямую, без разбора dict на каждый город.
+        """
+        rows = self._fetchall(_SQL_USER_CITIES, (int(user_id),))
+        return {
+            "names": [r[0] for r in rows],
+            "lats": np.fromiter((r[1] for r in rows), dtype=np.float64, count=len(rows)),
+            "lons": np.fromiter((r[2] for r in rows), dtype=np.float64, count=len(rows)),
+            "countries": [r[3] for r in rows],
+        }
 
     # ---------- Rendering ----------
-    def create_graph(self, out_path: str, cities: Iterable[Dict[str, Any]]) -> str:
+    def create_graph(
+        self, out: Union[str, BinaryIO], cities: Union[CityColumns, Iterable[Dict[str, Any]]]
+    ) -> Union[str, BinaryIO]:
         """
-        Рисует карту мира и отмечает точки из `cities` (dict: city, lat, lon|lng).
-        Сохраняет PNG по пути out_path и возвращает этот путь.
+        Рисует карту мира и отмечает точки из `cities` — результат select_cities
+        или список dict (city, lat, lon|lng).
+        Сохраняет PNG в `out` — путь или файловый объект (например, io.BytesIO) — и возвращает его.
         """
-        cities = list(cities)
-
-        # Создаём карту
-        fig = plt.figure(figsize=(10, 5), facecolor="white")
-        ax = plt.axes(projection=ccrs.PlateCarree())
-        ax.set_global()
-
-        # Базовые слои
-        ax.add_feature(cfeature.LAND, zorder=0, edgecolor="black", linewidth=0.2)
-        ax.add_feature(cfeature.OCEAN, zorder=0)
-        ax.add_feature(cfeature.COASTLINE, linewidth=0.4)
-        ax.add_feature(cfeature.BORDERS, linestyle=":", linewidth=0.4)
-
-        # Точки городов
-        for item in cities:
-            name = str(item.get("city") or item.get("name") or "")
-            lat = float(item["lat"])
-            # поддерживаем ключ и 'lon', и 'lng'
-            lon = float(item.get("lon", item.get("lng")))
-            ax.plot(lon, lat, marker="o", markersize=4, transform=ccrs.PlateCarree())
-            if name:
-                ax.text(lon + 1, lat + 1, name, fontsize=7, transform=ccrs.PlateCarree())
-
-        plt.tight_layout()
-        plt.savefig(out_path, dpi=200, bbox_inches="tight")
-        plt.close(fig)
-        return out_path
+        return render_map(out, cities)
 
     # На всякий случай — алиас, если где-то в шаблоне опечатка
-    def create_grapf(self, out_path: str, cities: Iterable[Dict[str, Any]]) -> str:
-        return self.create_graph(out_path, cities)
+    def create_grapf(
+        self, out: Union[str, BinaryIO], cities: Union[CityColumns, Iterable[Dict[str, Any]]]
+    ) -> Union[str, BinaryIO]:
+        return self.create_graph(out, cities)
 
-    def draw_distance(self, city1: str, city2: str, out_path: str) -> Optional[str]:
+    def draw_distance(
+        self, city1: str, city2: str, out: Union[str, BinaryIO]
+    ) -> Optional[Union[str, BinaryIO]]:
         """
         (необязательно) Рисует прямую линию между двумя городами.
-        Возвращает путь к PNG, если оба города найдены.
+        Сохраняет PNG в `out` (путь или файловый объект) и возвращает его, если оба города найдены.
         """
         c1 = self.get_coords_by_name(city1)
         c2 = self.get_coords_by_name(city2)
@@ -155,23 +436,14 @@ class DB_Map:
         lat1, lon1, name1 = c1
         lat2, lon2, name2 = c2
 
-        fig = plt.figure(figsize=(10, 5), facecolor="white")
-        ax = plt.axes(projection=ccrs.PlateCarree())
-        ax.set_global()
-        ax.add_feature(cfeature.LAND, zorder=0, edgecolor="black", linewidth=0.2)
-        ax.add_feature(cfeature.OCEAN, zorder=0)
-        ax.add_feature(cfeature.COASTLINE, linewidth=0.4)
-        ax.add_feature(cfeature.BORDERS, linestyle=":", linewidth=0.4)
-
-        ax.plot([lon1, lon2], [lat1, lat2], transform=ccrs.PlateCarree())
-        ax.plot([lon1, lon2], [lat1, lat2], marker="o", linestyle="", transform=ccrs.PlateCarree())
-        ax.text(lon1 + 1, lat1 + 1, name1, fontsize=8, transform=ccrs.PlateCarree())
-        ax.text(lon2 + 1, lat2 + 1, name2, fontsize=8, transform=ccrs.PlateCarree())
-
-        plt.tight_layout()
-        plt.savefig(out_path, dpi=200, bbox_inches="tight")
-        plt.close(fig)
-        return out_path
+        with _pooled_map_figure() as (fig, ax):
+            ax.plot([lon1, lon2], [lat1, lat2])
+            ax.plot([lon1, lon2], [lat1, lat2], marker="o", linestyle="")
+            ax.text(lon1 + 1, lat1 + 1, name1, fontsize=8)
+            ax.text(lon2 + 1, lat2 + 1, name2, fontsize=8)
+
+            _save_png(fig, out)
+        return out
 
 
 if __name__ == "__main__":